@@ -18,7 +18,11 @@ Output:
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import warnings
+from numba import get_num_threads, njit, prange
+from pandas.api.types import union_categoricals
 
 warnings.filterwarnings("ignore")
 
@@ -29,17 +33,27 @@ def load_data():
     print("LOADING DATA")
     print("=" * 60)
 
-    base = pd.read_stata("Base.dta")
+    # Only read the columns clean_data uses
+    base = pd.read_stata(
+        "Base.dta",
+        columns=["year", "rating_area", "issuer_name", "plan_type", "metal_level", "Enrollees"],
+    )
     print(f"Base.dta: {base.shape[0]:,} rows")
 
-    county_insurer = pd.read_stata("County_Profiles_Final.dta")
+    county_insurer = pd.read_stata(
+        "County_Profiles_Final.dta", columns=["year", "issuer", "county", "enrollees"]
+    )
     print(f"County_Profiles_Final.dta: {county_insurer.shape[0]:,} rows")
 
-    county_metal = pd.read_stata("County_Profiles_Metals_Final.dta")
+    county_metal = pd.read_stata(
+        "County_Profiles_Metals_Final.dta", columns=["year", "metal_tier", "county", "enrollees"]
+    )
     print(f"County_Profiles_Metals_Final.dta: {county_metal.shape[0]:,} rows")
 
     # Sheet 0 has 59 rows: LA County appears in both RA 15 and RA 16
-    crosswalk = pd.read_excel("ca_dma_ratingarea_crosswalk.xlsx", sheet_name=0)
+    crosswalk = pd.read_excel(
+        "ca_dma_ratingarea_crosswalk.xlsx", sheet_name=0, usecols=["countyname", "ratingarea"]
+    )
     print(f"Crosswalk: {crosswalk.shape[0]:,} rows")
 
     return base, county_insurer, county_metal, crosswalk
@@ -84,10 +98,11 @@ def clean_data(base, county_insurer, county_metal, crosswalk):
     print(f"Base after metal tier mapping: {len(base):,} rows")
 
     base = base[["year", "rating_area", "insurer", "plan", "metal_tier", "enrollment"]]
-    base = (
-        base.groupby(["year", "rating_area", "insurer", "plan", "metal_tier"], as_index=False)
-        ["enrollment"].sum()
-    )
+    base = base.astype({"insurer": "category", "plan": "category", "metal_tier": "category"})
+    base = base.groupby(
+        ["year", "rating_area", "insurer", "plan", "metal_tier"],
+        as_index=False, observed=True, sort=False,
+    )["enrollment"].sum()
     print(f"Base after aggregation: {len(base):,} rows")
 
     # --- County insurer profiles ---
@@ -98,8 +113,9 @@ def clean_data(base, county_insurer, county_metal, crosswalk):
     county_insurer["county"] = county_insurer["county"].str.upper().str.strip()
     county_insurer = county_insurer.rename(columns={"issuer": "insurer"})
     county_insurer = county_insurer[["year", "insurer", "county", "target_ic"]]
+    county_insurer = county_insurer.astype({"insurer": "category", "county": "category"})
     county_insurer = county_insurer.groupby(
-        ["year", "insurer", "county"], as_index=False
+        ["year", "insurer", "county"], as_index=False, observed=True, sort=False
     )["target_ic"].sum()
     print(f"County insurer targets: {len(county_insurer):,} rows")
 
@@ -110,8 +126,9 @@ def clean_data(base, county_insurer, county_metal, crosswalk):
         county_metal["enrollees"], errors="coerce"
     ).fillna(0)
     county_metal = county_metal[["year", "metal_tier", "county", "target_mc"]]
+    county_metal = county_metal.astype({"metal_tier": "category", "county": "category"})
     county_metal = county_metal.groupby(
-        ["year", "metal_tier", "county"], as_index=False
+        ["year", "metal_tier", "county"], as_index=False, observed=True, sort=False
     )["target_mc"].sum()
     print(f"County metal targets: {len(county_metal):,} rows")
 
@@ -128,6 +145,27 @@ def clean_data(base, county_insurer, county_metal, crosswalk):
     n_per_ra = crosswalk.groupby("rating_area")["county"].transform("count")
     crosswalk["weight"] = 1.0 / n_per_ra
 
+    # --- Categorical keys ---
+    # Recode to shared sorted categories per key so groupbys, merges and
+    # sorts across frames all work on the same integer codes
+    key_frames = {
+        "insurer": [base, county_insurer],
+        "plan": [base],
+        "metal_tier": [base, county_metal],
+        "county": [county_insurer, county_metal, crosswalk],
+    }
+    for col, frames in key_frames.items():
+        categories = union_categoricals(
+            [pd.Categorical(frame[col]) for frame in frames], sort_categories=True
+        ).categories
+        for frame in frames:
+            frame[col] = frame[col].astype(pd.CategoricalDtype(categories))
+
+    # The dedup groupbys above skip sorting; sort base once for a stable row order
+    base = base.sort_values(
+        ["year", "rating_area", "insurer", "plan", "metal_tier"], ignore_index=True
+    )
+
     return base, county_insurer, county_metal, crosswalk
 
 
@@ -137,10 +175,10 @@ def check_margin_consistency(county_insurer, county_metal):
     print("MARGIN CONSISTENCY CHECK")
     print("=" * 60)
 
-    ic_totals = county_insurer.groupby(["year", "county"])["target_ic"].sum().reset_index(
+    ic_totals = county_insurer.groupby(["year", "county"], observed=True)["target_ic"].sum().reset_index(
         name="insurer_total"
     )
-    mc_totals = county_metal.groupby(["year", "county"])["target_mc"].sum().reset_index(
+    mc_totals = county_metal.groupby(["year", "county"], observed=True)["target_mc"].sum().reset_index(
         name="metal_total"
     )
     merged = ic_totals.merge(mc_totals, on=["year", "county"], how="outer").fillna(0)
@@ -159,12 +197,17 @@ def check_margin_consistency(county_insurer, county_metal):
         print("      consistent. IPF will find the best compromise but cannot exactly")
         print("      satisfy both constraints simultaneously.")
 
-    for yr in sorted(merged["year"].unique()):
-        m = merged[merged["year"] == yr]
-        it = m["insurer_total"].sum()
-        mt = m["metal_total"].sum()
-        diff_pct = 100 * abs(it - mt) / mt if mt > 0 else 0
-        print(f"  Year {int(yr)}: insurer total={it:,.0f}, metal total={mt:,.0f}, diff={diff_pct:.1f}%")
+    yearly = merged.groupby("year")[["insurer_total", "metal_total"]].sum()
+    yearly["diff_pct"] = np.where(
+        yearly["metal_total"] > 0,
+        100 * np.abs(yearly["insurer_total"] - yearly["metal_total"]) / yearly["metal_total"],
+        0,
+    )
+    for yr, row in yearly.iterrows():
+        print(
+            f"  Year {int(yr)}: insurer total={row['insurer_total']:,.0f}, "
+            f"metal total={row['metal_total']:,.0f}, diff={row['diff_pct']:.1f}%"
+        )
 
 
 def initial_allocation(base, crosswalk):
@@ -173,8 +216,10 @@ def initial_allocation(base, crosswalk):
     print("STAGE 1: INITIAL ALLOCATION")
     print("=" * 60)
 
-    alloc = base.merge(
-        crosswalk[["county", "rating_area", "weight"]],
+    # Index join against the small crosswalk; each base row is repeated once
+    # per county in its rating area, keeping base row order
+    alloc = base.join(
+        crosswalk.set_index("rating_area")[["county", "weight"]],
         on="rating_area",
         how="inner",
     )
@@ -186,110 +231,227 @@ def initial_allocation(base, crosswalk):
 
     alloc = alloc[
         ["year", "county", "rating_area", "insurer", "plan", "metal_tier", "enrollment_est"]
-    ].copy()
+    ].reset_index(drop=True)
 
     return alloc
 
 
+def _group_codes(df, cols):
+    """Return dense integer group codes for the composite key `cols` and the group count."""
+    # Combine per-column codes arithmetically, then re-compact to 0..n-1
+    codes = np.zeros(len(df), dtype=np.int64)
+    for col in cols:
+        col_codes, col_uniques = pd.factorize(df[col], sort=False)
+        codes = codes * len(col_uniques) + col_codes
+    codes, uniques = pd.factorize(codes, sort=False)
+    return codes, len(uniques)
+
+
+@njit(cache=True, parallel=True)
+def _reduce_factors(targets, partials, factors):
+    """Fill `factors` with each group's target / summed partials (0 for empty groups)."""
+    for g in prange(factors.shape[0]):
+        total = 0.0
+        for c in range(partials.shape[0]):
+            total += partials[c, g]
+        factors[g] = targets[g] / total if total > 1e-10 else 0.0
+
+
+@njit(cache=True, parallel=True)
+def _ipf_kernel(
+    est, year_codes, ic_codes, ic_targets, mc_codes, mc_targets,
+    max_iter, tol, n_chunks, changes, n_iters,
+):
+    """Run IPF in place on `est` for all years at once.
+
+    Group codes never span years, so each year is an independent fit; a
+    year stops being scaled once its max relative change drops below `tol`.
+    changes[k, y] is year y's max relative change at iteration k + 1, and
+    n_iters[y] the number of iterations year y ran.
+
+    Over one iteration a row is scaled by its insurer x county factor and
+    then its metal x county factor, so its relative change is
+    |f_ic * f_mc - 1|; this is evaluated from the group factors rather than
+    from a copy of the previous estimates.
+
+    Row passes are split into `n_chunks` chunks processed in parallel, each
+    summing into its own row of the partial group sums (and per-year
+    changes). Each pass that applies one margin's factors also accumulates
+    the sums for the other margin, so an iteration reads `est` twice.
+    """
+    n_years = n_iters.shape[0]
+    chunk_size = -(-est.shape[0] // n_chunks)
+
+    # Work buffers are allocated once and reused every iteration
+    ic_partials = np.empty((n_chunks, ic_targets.shape[0]))
+    ic_factors = np.empty(ic_targets.shape[0])
+    mc_partials = np.empty((n_chunks, mc_targets.shape[0]))
+    mc_factors = np.empty(mc_targets.shape[0])
+    change_partials = np.empty((n_chunks, n_years))
+    active = np.ones(n_years, dtype=np.bool_)
+
+    # Insurer x County sums for the first iteration; later iterations
+    # accumulate them while applying the Metal Tier x County factors
+    for c in prange(n_chunks):
+        ic_partials[c, :] = 0.0
+        for i in range(c * chunk_size, min((c + 1) * chunk_size, est.shape[0])):
+            ic_partials[c, ic_codes[i]] += est[i]
+
+    for iteration in range(max_iter):
+        change_partials[:] = 0.0
+
+        # STEP A: Adjust to Insurer x County margins, accumulating the
+        # Metal Tier x County sums in the same pass
+        _reduce_factors(ic_targets, ic_partials, ic_factors)
+        for c in prange(n_chunks):
+            mc_partials[c, :] = 0.0
+            for i in range(c * chunk_size, min((c + 1) * chunk_size, est.shape[0])):
+                y = year_codes[i]
+                if not active[y]:
+                    continue
+                f = ic_factors[ic_codes[i]]
+                if f == 0.0 and est[i] > 1e-10:
+                    change_partials[c, y] = 1.0  # row is zeroed out
+                est[i] *= f
+                mc_partials[c, mc_codes[i]] += est[i]
+
+        # STEP B: Adjust to Metal Tier x County margins; the convergence
+        # metric and the next iteration's Insurer x County sums are
+        # computed in the same pass
+        _reduce_factors(mc_targets, mc_partials, mc_factors)
+        for c in prange(n_chunks):
+            ic_partials[c, :] = 0.0
+            for i in range(c * chunk_size, min((c + 1) * chunk_size, est.shape[0])):
+                y = year_codes[i]
+                if not active[y]:
+                    continue
+                f_ic = ic_factors[ic_codes[i]]
+                f_mc = mc_factors[mc_codes[i]]
+                # Only rows that were above 1e-10 before step A count
+                if f_ic > 0.0 and est[i] > 1e-10 * f_ic:
+                    change = abs(f_ic * f_mc - 1.0)
+                    if change > change_partials[c, y]:
+                        change_partials[c, y] = change
+                est[i] *= f_mc
+                ic_partials[c, ic_codes[i]] += est[i]
+
+        n_active = 0
+        for y in range(n_years):
+            if active[y]:
+                year_change = change_partials[:, y].max()
+                changes[iteration, y] = year_change
+                n_iters[y] = iteration + 1
+                if year_change < tol:
+                    active[y] = False
+                else:
+                    n_active += 1
+        if n_active == 0:
+            break
+
+
 def run_ipf(alloc, county_insurer, county_metal, max_iter=100, tol=0.001):
-    """Stage 2: Iterative Proportional Fitting."""
+    """Stage 2: Iterative Proportional Fitting.
+
+    Returns the allocated frame and a dict of IPF diagnostics: the group
+    codes, group targets and final group sums for both margins.
+    """
     print("\n" + "=" * 60)
     print("STAGE 2: ITERATIVE PROPORTIONAL FITTING")
     print("=" * 60)
 
-    years = sorted(alloc["year"].dropna().unique())
+    # All years are fitted in a single kernel call; rows are ordered by year
+    df = alloc.dropna(subset=["year"]).sort_values("year", kind="stable", ignore_index=True)
+    year_codes, years = pd.factorize(df["year"], sort=True)
     print(f"Processing years: {[int(y) for y in years]}")
 
-    results = []
-
-    for yr in years:
-        print(f"\n--- Year {int(yr)} ---")
-
-        df = alloc[alloc["year"] == yr].copy().reset_index(drop=True)
-        if len(df) == 0:
-            print(f"  No data for year {int(yr)}, skipping.")
-            continue
-
-        # Control totals for this year
-        targets_ic = county_insurer[county_insurer["year"] == yr]
-        targets_mc = county_metal[county_metal["year"] == yr]
-
-        # Build fast lookup Series
-        ic_lookup = targets_ic.set_index(["insurer", "county"])["target_ic"]
-        mc_lookup = targets_mc.set_index(["metal_tier", "county"])["target_mc"]
-
-        # Pre-compute lookup keys for each row (avoids repeated tuple creation)
-        ic_keys = list(zip(df["insurer"], df["county"]))
-        mc_keys = list(zip(df["metal_tier"], df["county"]))
-
-        ic_targets = np.array([ic_lookup.get(k, 0) for k in ic_keys], dtype=np.float64)
-        mc_targets = np.array([mc_lookup.get(k, 0) for k in mc_keys], dtype=np.float64)
-
-        converged = False
-        final_max_change = np.inf
-
-        for iteration in range(1, max_iter + 1):
-            prev_est = df["enrollment_est"].values.copy()
-
-            # STEP A: Adjust to Insurer x County margins
-            group_sums = df.groupby(["insurer", "county"])["enrollment_est"].transform("sum").values
-            factors = np.where(group_sums > 1e-10, ic_targets / group_sums, 0)
-            df["enrollment_est"] = df["enrollment_est"].values * factors
-
-            # STEP B: Adjust to Metal Tier x County margins
-            group_sums = df.groupby(["metal_tier", "county"])["enrollment_est"].transform("sum").values
-            factors = np.where(group_sums > 1e-10, mc_targets / group_sums, 0)
-            df["enrollment_est"] = df["enrollment_est"].values * factors
-
-            # Convergence check
-            current_est = df["enrollment_est"].values
-            nonzero = prev_est > 1e-10
-            if nonzero.any():
-                max_change = (
-                    np.abs(current_est[nonzero] - prev_est[nonzero]) / prev_est[nonzero]
-                ).max()
-            else:
-                max_change = 0.0
+    # Row-level targets via left merge (keys are unique after clean_data,
+    # so the left row order is preserved)
+    ic_targets = (
+        df[["year", "insurer", "county"]]
+        .merge(county_insurer, on=["year", "insurer", "county"], how="left")
+        ["target_ic"].fillna(0).to_numpy(dtype=np.float64)
+    )
+    mc_targets = (
+        df[["year", "metal_tier", "county"]]
+        .merge(county_metal, on=["year", "metal_tier", "county"], how="left")
+        ["target_mc"].fillna(0).to_numpy(dtype=np.float64)
+    )
 
-            final_max_change = max_change
+    # Group codes are computed once; the keys do not change between
+    # iterations, so the kernel only needs the integer codes. Including the
+    # year keeps every group within a single year.
+    ic_codes, n_ic = _group_codes(df, ["year", "insurer", "county"])
+    mc_codes, n_mc = _group_codes(df, ["year", "metal_tier", "county"])
+
+    # One target per group (all rows of a group share the same target)
+    ic_group_targets = np.zeros(n_ic)
+    ic_group_targets[ic_codes] = ic_targets
+    mc_group_targets = np.zeros(n_mc)
+    mc_group_targets[mc_codes] = mc_targets
+
+    # Estimates are carried in float32 (ample for enrollment counts at the
+    # 0.001 tolerance); the kernel's group sums and targets stay float64
+    est = df["enrollment_est"].to_numpy(dtype=np.float32, copy=True)
+    changes = np.full((max_iter, len(years)), np.inf)
+    n_iters = np.zeros(len(years), dtype=np.int64)
+    # One chunk per thread for large inputs; below ~100k rows per chunk the
+    # thread overhead outweighs the gain, so small inputs run as one chunk
+    n_chunks = max(1, min(get_num_threads(), len(est) // 100_000))
+    _ipf_kernel(
+        est, year_codes, ic_codes, ic_group_targets, mc_codes, mc_group_targets,
+        max_iter, tol, n_chunks, changes, n_iters,
+    )
+    np.maximum(est, 0, out=est)
+    df["enrollment_est"] = est
 
-            if max_change < tol:
-                print(f"  Converged at iteration {iteration}, max relative change = {max_change:.6f}")
-                converged = True
-                break
+    for y, yr in enumerate(years):
+        print(f"\n--- Year {int(yr)} ---")
 
-            if iteration % 20 == 0:
-                print(f"  Iteration {iteration}, max relative change = {max_change:.6f}")
+        n_iter = n_iters[y]
+        for iteration in range(20, n_iter + 1, 20):
+            if changes[iteration - 1, y] >= tol:
+                print(f"  Iteration {iteration}, max relative change = {changes[iteration - 1, y]:.6f}")
 
-        if not converged:
+        final_max_change = changes[n_iter - 1, y] if n_iter > 0 else np.inf
+        if final_max_change < tol:
+            print(f"  Converged at iteration {n_iter}, max relative change = {final_max_change:.6f}")
+        else:
             print(
                 f"  WARNING: Did not converge after {max_iter} iterations. "
                 f"Final max change = {final_max_change:.6f}"
             )
 
-        results.append(df)
+    diagnostics = {
+        "ic_codes": ic_codes,
+        "ic_targets": ic_group_targets,
+        "ic_sums": np.bincount(ic_codes, weights=est, minlength=n_ic),
+        "mc_codes": mc_codes,
+        "mc_targets": mc_group_targets,
+        "mc_sums": np.bincount(mc_codes, weights=est, minlength=n_mc),
+    }
 
-    allocated = pd.concat(results, ignore_index=True)
-    allocated["enrollment_est"] = allocated["enrollment_est"].clip(lower=0)
-    print(f"\nFinal allocated dataset: {len(allocated):,} rows")
+    print(f"\nFinal allocated dataset: {len(df):,} rows")
 
-    return allocated
+    return df, diagnostics
 
 
-def validate(allocated, county_insurer, county_metal, base):
+def validate(allocated, diagnostics, base):
     """Run validation checks on the allocated data."""
     print("\n" + "=" * 60)
     print("VALIDATION CHECKS")
     print("=" * 60)
 
+    # Checks 1 and 2 compare the final IPF group sums to their targets;
+    # groups without a target (target 0) are skipped
+    ic_sums, ic_targets = diagnostics["ic_sums"], diagnostics["ic_targets"]
+    mc_sums, mc_targets = diagnostics["mc_sums"], diagnostics["mc_targets"]
+
     # Check 1: Insurer x County totals
-    check_ic = allocated.groupby(["year", "insurer", "county"])["enrollment_est"].sum().reset_index()
-    check_ic = check_ic.merge(county_insurer, on=["year", "insurer", "county"], how="inner")
-    mask = check_ic["target_ic"] > 0
+    mask = ic_targets > 0
     if mask.any():
-        diffs = np.abs(check_ic.loc[mask, "enrollment_est"] - check_ic.loc[mask, "target_ic"]) / check_ic.loc[mask, "target_ic"]
+        diffs = np.abs(ic_sums[mask] - ic_targets[mask]) / ic_targets[mask]
         max_ic_diff = diffs.max()
-        median_ic_diff = diffs.median()
+        median_ic_diff = np.median(diffs)
         pct_within_1 = 100 * (diffs < 0.01).mean()
         pct_within_5 = 100 * (diffs < 0.05).mean()
         print(f"Check 1 (Insurer x County): max relative diff = {max_ic_diff:.4f}, "
@@ -301,27 +463,27 @@ def validate(allocated, county_insurer, county_metal, base):
             print("  NOTE: Differences due to inconsistent margins between control files")
 
     # Check 2: Metal Tier x County totals
-    check_mc = allocated.groupby(["year", "metal_tier", "county"])["enrollment_est"].sum().reset_index()
-    check_mc = check_mc.merge(county_metal, on=["year", "metal_tier", "county"], how="inner")
-    mask = check_mc["target_mc"] > 0
+    mask = mc_targets > 0
     if mask.any():
-        diffs = np.abs(check_mc.loc[mask, "enrollment_est"] - check_mc.loc[mask, "target_mc"]) / check_mc.loc[mask, "target_mc"]
+        diffs = np.abs(mc_sums[mask] - mc_targets[mask]) / mc_targets[mask]
         max_mc_diff = diffs.max()
         print(f"Check 2 (Metal x County): max relative diff = {max_mc_diff:.6f}")
         print(f"  {'PASS' if max_mc_diff < 0.001 else 'FAIL'}")
 
     # Check 3: Rating area totals
     check_ra = allocated.groupby(
-        ["year", "rating_area", "insurer", "plan", "metal_tier"]
+        ["year", "rating_area", "insurer", "plan", "metal_tier"], observed=True
     )["enrollment_est"].sum().reset_index()
     check_ra = check_ra.merge(
         base, on=["year", "rating_area", "insurer", "plan", "metal_tier"], how="inner"
     )
-    mask = check_ra["enrollment"] > 0
+    ra_sums = check_ra["enrollment_est"].to_numpy(dtype=np.float64)
+    ra_targets = check_ra["enrollment"].to_numpy(dtype=np.float64)
+    mask = ra_targets > 0
     if mask.any():
-        diffs = np.abs(check_ra.loc[mask, "enrollment_est"] - check_ra.loc[mask, "enrollment"]) / check_ra.loc[mask, "enrollment"]
+        diffs = np.abs(ra_sums[mask] - ra_targets[mask]) / ra_targets[mask]
         max_ra_diff = diffs.max()
-        median_ra_diff = diffs.median()
+        median_ra_diff = np.median(diffs)
         print(f"Check 3 (Rating Area totals): max relative diff = {max_ra_diff:.4f}, "
               f"median = {median_ra_diff:.4f}")
         if max_ra_diff < 0.001:
@@ -330,7 +492,7 @@ def validate(allocated, county_insurer, county_metal, base):
             print("  NOTE: Rating area totals shift during IPF (expected when margins conflict)")
 
     # Check 4: No negatives
-    neg_count = (allocated["enrollment_est"] < 0).sum()
+    neg_count = np.count_nonzero(allocated["enrollment_est"].to_numpy() < 0)
     print(f"Check 4 (No negatives): {'PASS' if neg_count == 0 else 'FAIL'} ({neg_count} negative values)")
 
 
@@ -340,12 +502,22 @@ def save_output(allocated):
     print("SAVING OUTPUT")
     print("=" * 60)
 
-    output = (
-        allocated[["year", "county", "rating_area", "insurer", "plan", "metal_tier", "enrollment_est"]]
-        .sort_values(["year", "county", "insurer", "plan", "metal_tier"])
-        .reset_index(drop=True)
-    )
-    output.to_csv("enrollment_allocated.csv", index=False)
+    output = allocated[
+        ["year", "county", "rating_area", "insurer", "plan", "metal_tier", "enrollment_est"]
+    ]
+    # Sort by year, county, insurer, plan, metal_tier on the integer category
+    # codes (categories are sorted, so this matches a sort on the strings);
+    # np.lexsort takes the primary key last
+    order = np.lexsort((
+        output["metal_tier"].cat.codes.to_numpy(),
+        output["plan"].cat.codes.to_numpy(),
+        output["insurer"].cat.codes.to_numpy(),
+        output["county"].cat.codes.to_numpy(),
+        output["year"].to_numpy(dtype=np.int64),
+    ))
+    output = output.iloc[order].reset_index(drop=True)
+    # Arrow's columnar CSV writer; string fields are written quoted
+    pacsv.write_csv(pa.Table.from_pandas(output, preserve_index=False), "enrollment_allocated.csv")
     print(f"Saved enrollment_allocated.csv ({len(output):,} rows)")
 
     print("\n" + "=" * 60)
@@ -373,8 +545,8 @@ def main():
     check_margin_consistency(county_insurer, county_metal)
 
     alloc = initial_allocation(base, crosswalk)
-    allocated = run_ipf(alloc, county_insurer, county_metal, max_iter=100, tol=0.001)
-    validate(allocated, county_insurer, county_metal, base)
+    allocated, diagnostics = run_ipf(alloc, county_insurer, county_metal, max_iter=100, tol=0.001)
+    validate(allocated, diagnostics, base)
     save_output(allocated)
 
     print("\nDone.")